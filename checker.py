@@ -23,8 +23,8 @@
 # CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import pypm
-import time
 import random
+from runtime import Runtime
 
 class Checker(object):
   def __init__(self, wait=1, in_device_id=1, out_device_id=3):
@@ -33,8 +33,17 @@ class Checker(object):
     self.out_device_id = out_device_id
 
   def run(self):
-    self.running = True
     pypm.Initialize()
+    try:
+      runtime = Runtime()
+      runtime.spawn(self.task(), 'checker')
+      runtime.run()
+    finally:
+      pypm.Terminate()
+
+  def task(self):
+    '''Coroutine that alternates the checker pattern; it can share a Runtime with other toys.'''
+    self.running = True
     self.in_device = pypm.Input(self.in_device_id)
     self.out_device = pypm.Output(self.out_device_id)
 
@@ -54,16 +63,15 @@ class Checker(object):
     try:
       while self.running:
         self.set_pattern(0)
-        time.sleep(self.wait)
+        yield self.wait
         self.set_pattern(1)
-        time.sleep(self.wait)
+        yield self.wait
 
     finally:
       print("Shutting down.")
       self.clear()
       self.in_device.Close()
       self.out_device.Close()
-      pypm.Terminate()
 
   def read_buttons(self):
     while self.in_device.Poll():
@@ -24,7 +24,14 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import pypm, time, random, copy, argparse, sys, traceback
+import time, random, copy, argparse, sys, traceback, os, multiprocessing, collections
+try:
+  import pypm
+except ImportError:
+  # Only needed for real devices; --census and --simulate work without it.
+  pypm = None
+import patterns, runtime, sharedboard
+from runtime import Runtime, Return
 
 # Concept of views
 # There is one root view which may delegate to sub-views.
@@ -47,6 +54,10 @@ class LifeView(object):
   def handle_input(self):
     pass
 
+  def render(self):
+    '''Shows the model changes since the last render.  Returns the number of cells updated.'''
+    return 0
+
   def add_listener(self, listener):
     self.listeners.append(listener)
 
@@ -55,13 +66,28 @@ class PrintingLifeView(LifeView):
     print(o, i, v)
 
 class UIDriver(object):
+  # Output priorities.  Interactive feedback is sent ahead of bulk updates such as simulation frames.
+  INTERACTIVE = 0
+  BULK = 1
+
+  # How often get_async() checks for input.  MIDI input can't be waited on so it has to be polled.
+  poll_interval = 0.005
+
   def close(self):
     pass
 
   def get(self):
     return []
 
-  def set(self, col, row, value):
+  def get_async(self):
+    '''Coroutine that waits for input and returns the available UIInputEvents.'''
+    while True:
+      events = self.get()
+      if events:
+        raise Return(events)
+      yield self.poll_interval
+
+  def set(self, col, row, value, priority=BULK):
     pass
 
   def clear(self, col=None, row=None):
@@ -70,15 +96,20 @@ class UIDriver(object):
   def commit(self):
     pass
 
+  def commit_async(self, priority=None):
+    '''Coroutine version of commit().  Given a priority, it only waits for updates of that priority to go out.'''
+    self.commit()
+    yield
+
   def close(self):
     pass
 
-class UIInputEvent(object):
-  '''Represents a UI event in "app space" meaning that coordinates are converted away from the raw device coordinates (i.e. in grid-space, not MIDI-space).  The value currently represents the value from the input device, however, until I define a suitable grid-space value domain.'''
-  def __init__(self, col, row, value):
-    self.col = col
-    self.row = row
-    self.value = value
+class UIInputEvent(collections.namedtuple('UIInputEvent', 'col row value')):
+  '''Represents a UI event in "app space" meaning that coordinates are converted away from the raw device coordinates (i.e. in grid-space, not MIDI-space).  The value currently represents the value from the input device, however, until I define a suitable grid-space value domain.
+
+  Events are immutable so drivers can hand out the same instance for every identical event.
+  '''
+  __slots__ = ()
 
 class DebugDriver(UIDriver):
   def __init__(self, inner):
@@ -91,21 +122,35 @@ class DebugDriver(UIDriver):
     else:
       return []
 
-  def set(self, col, row, value):
+  def set(self, col, row, value, priority=UIDriver.BULK):
     self.log('set({0}, {1}, {2})'.format(col, row, value))
     if self.inner:
-      return self.inner.set(col, row, value)
+      return self.inner.set(col, row, value, priority)
 
   def clear(self, col=None, row=None):
     self.log('clear({0}, {1})'.format(col, row))
     if self.inner:
       return self.inner.clear()
 
+  def get_async(self):
+    if not self.inner:
+      # No input will ever arrive.
+      while True:
+        yield 3600
+    events = yield self.inner.get_async()
+    self.log('get')
+    raise Return(events)
+
   def commit(self):
     self.log('commit')
     if self.inner:
       return self.inner.commit()
 
+  def commit_async(self, priority=None):
+    self.log('commit')
+    if self.inner:
+      yield self.inner.commit_async(priority)
+
   def close(self):
     self.log('close')
     if self.inner:
@@ -114,17 +159,144 @@ class DebugDriver(UIDriver):
   def log(self, message):
     print(message)
 
+class OutputScheduler(object):
+  '''Paces pad updates to what a MIDI link can carry.
+
+  Only the latest value for each pad is kept, so repeated writes to a pad coalesce and a backlog can never grow beyond one message per pad.  Interactive updates are sent before bulk ones.  Updates that would set a pad to the value it already shows are dropped.  A token bucket of bandwidth bytes per second, holding at most latency seconds worth, limits how much send() writes at a time.
+
+  >>> now = [0.0]
+  >>> def write(messages): print(messages)
+  >>> out = OutputScheduler(write, bandwidth=300, latency=0.01, clock=lambda: now[0])
+  >>> for note in range(4): out.put(note, 1)
+  >>> out.put(0, 5)
+  >>> out.put(100, 127, UIDriver.INTERACTIVE)
+  >>> out.send()
+  [(100, 127)]
+  1
+  >>> out.pending(), out.delay()
+  (4, 0.01)
+  >>> now[0] += 0.02
+  >>> out.send()
+  [(0, 5)]
+  1
+  >>> out.flush()
+  [(1, 1), (2, 1), (3, 1)]
+  3
+  >>> out.put(2, 1)
+  >>> out.flush()
+  0
+  >>> out.messages, out.coalesced, out.dropped
+  (5, 1, 1)
+  '''
+  # A note-on is three bytes on the wire.
+  MESSAGE_BYTES = 3
+
+  def __init__(self, write, bandwidth=3125, latency=0.02, max_write=64, clock=time.time):
+    if bandwidth <= 0:
+      raise ValueError("The bandwidth must be greater than 0, not {0}.".format(bandwidth))
+    self.write = write
+    self.bandwidth = float(bandwidth)
+    self.burst = max(self.MESSAGE_BYTES, self.bandwidth * latency)
+    self.max_write = max_write
+    self.clock = clock
+    self.tokens = self.burst
+    self.updated = clock()
+    self.queues = (collections.OrderedDict(), collections.OrderedDict())
+    self.shown = {}
+    self.messages = 0
+    self.coalesced = 0
+    self.dropped = 0
+
+  def put(self, note, velocity, priority=UIDriver.BULK):
+    '''Queues a pad update, replacing any update to the same pad that hasn't been sent yet.'''
+    interactive, bulk = self.queues
+    if note in interactive:
+      self.coalesced += 1
+      interactive[note] = velocity
+    elif note in bulk:
+      self.coalesced += 1
+      if priority == UIDriver.INTERACTIVE:
+        del bulk[note]
+        interactive[note] = velocity
+      else:
+        bulk[note] = velocity
+    else:
+      self.queues[priority][note] = velocity
+
+  def pending(self, priority=None):
+    '''Returns the number of updates waiting to be sent, either all of them or just those of one priority.'''
+    if priority is not None:
+      return len(self.queues[priority])
+    return len(self.queues[0]) + len(self.queues[1])
+
+  def _refill(self):
+    now = self.clock()
+    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.bandwidth)
+    self.updated = now
+
+  def delay(self):
+    '''Returns the seconds until the link can take another message.'''
+    self._refill()
+    return max(0.0, (self.MESSAGE_BYTES - self.tokens) / self.bandwidth)
+
+  def flush(self, limit=None):
+    '''Writes up to limit pending updates, most urgent first, regardless of bandwidth.  Returns the number written.'''
+    batch = []
+    for queue in self.queues:
+      while queue and (limit is None or len(batch) < limit):
+        note, velocity = queue.popitem(last=False)
+        if self.shown.get(note) == velocity:
+          self.dropped += 1
+          continue
+        self.shown[note] = velocity
+        batch.append((note, velocity))
+    for i in range(0, len(batch), self.max_write):
+      self.write(batch[i:i+self.max_write])
+    self.messages += len(batch)
+    return len(batch)
+
+  def send(self):
+    '''Writes as many pending updates as the link has room for right now.  Returns the number written.'''
+    self._refill()
+    # Allow for rounding, or a wait of delay() could leave the bucket a hair short forever.
+    sent = self.flush(int(self.tokens / self.MESSAGE_BYTES + 1e-9))
+    self.tokens -= sent * self.MESSAGE_BYTES
+    return sent
+
 class MidiDriver(UIDriver):
   '''Drives UI interactions with a MIDI device.  Currently implemented with the Novation Launchpad Mini grid controller.  Ideally more mappings would be supported.'''
-  def __init__(self, in_device_id, out_device_id):
+  # Input is read this many messages at a time, and one get() reads at most max_events messages, whether or not they turn into events.
+  read_block = 256
+  max_events = 1024
+
+  # Launchpad top row buttons send these controller numbers.  They are reported as row -1.
+  TOP_ROW_CONTROLLERS = range(104, 112)
+
+  # Decoded events by (status << 14 | note << 7 | value), shared by all drivers.
+  _events = {}
+
+  def __init__(self, in_device_id, out_device_id, bandwidth=3125, report_releases=False, debounce=30, clock=time.time):
+    '''Opens the MIDI devices.  Button releases are only reported by get() if report_releases is set, and presses of a pad within debounce milliseconds of the last one are ignored.'''
+    self.report_releases = report_releases
+    self.debounce = debounce
+    self.last_press = {}
+    self.in_device, self.out_device = self.open_devices(in_device_id, out_device_id)
+    # Defaults to the bandwidth of a classic 31250 baud MIDI link.
+    self.output = OutputScheduler(self.write, bandwidth, clock=clock)
+
+  def open_devices(self, in_device_id, out_device_id):
     print "Opening devices:"
 
-    self.in_device = pypm.Input(in_device_id)
-    print "\tin: {0}, {1}".format(in_device_id, self.in_device)
+    in_device = pypm.Input(in_device_id)
+    print "\tin: {0}, {1}".format(in_device_id, in_device)
+
+    out_device = pypm.Output(out_device_id)
+    print "\tin: {0}, {1}".format(out_device_id, out_device)
+    return (in_device, out_device)
 
-    self.out_device = pypm.Output(out_device_id)
-    print "\tin: {0}, {1}".format(out_device_id, self.out_device)
-    self.write_queue = []
+  def time(self):
+    '''Returns the MIDI timestamp for messages written now.'''
+    return pypm.Time()
 
   @classmethod
   def list_devices(cls):
@@ -135,32 +307,102 @@ class MidiDriver(UIDriver):
     return ret
 
   def get(self):
-    '''Gets any available UIInputEvents from the attached MIDI device.'''
+    '''Gets any available UIInputEvents from the attached MIDI device.  A flood of messages, even ones that are ignored, is read at most max_events at a time so other tasks still get a turn.
+
+    >>> class Flood(object):
+    ...   reads = 0
+    ...   def Poll(self): return True
+    ...   def Read(self, count):
+    ...     self.reads += 1
+    ...     return [[[176, 1, 64, 0], 0]] * count
+    >>> class FloodDriver(MidiDriver):
+    ...   def open_devices(self, in_device_id, out_device_id): return (Flood(), None)
+    >>> d = FloodDriver(None, None)
+    >>> d.get(), d.in_device.reads
+    ([], 4)
+    '''
     events = []
-    while self.in_device.Poll():
-      for e in self.in_device.Read(1):
-        coords = self.map_midi_to_ui(e[0][1])
-        events.append(UIInputEvent(coords[0], coords[1], e[0][2]))
+    decode = self.decode
+    last_press = self.last_press
+    read = 0
+    while read < self.max_events and self.in_device.Poll():
+      messages = self.in_device.Read(min(self.read_block, self.max_events - read))
+      if not messages:
+        break
+      read += len(messages)
+      for (status, note, value, _), timestamp in messages:
+        event = decode(status, note, value)
+        if event is None:
+          continue
+        if event.value == 0:
+          if self.report_releases:
+            events.append(event)
+          continue
+
+        key = (status & 0xF0) << 7 | note
+        if timestamp - last_press.get(key, -self.debounce) < self.debounce:
+          continue
+        last_press[key] = timestamp
+        events.append(event)
     return events
 
-  def set(self, col, row, velocity=127):
+  @classmethod
+  def decode(cls, status, note, value):
+    '''Turns a raw MIDI message into a UIInputEvent, or None for messages that aren't button presses or releases.  Events are built once and then reused.
+
+    >>> MidiDriver.decode(144, 85, 127)
+    UIInputEvent(col=5, row=5, value=127)
+    >>> MidiDriver.decode(144, 85, 127) is MidiDriver.decode(144, 85, 127)
+    True
+    >>> MidiDriver.decode(128, 8, 64)
+    UIInputEvent(col=8, row=0, value=0)
+    >>> MidiDriver.decode(176, 104, 127)
+    UIInputEvent(col=0, row=-1, value=127)
+    >>> MidiDriver.decode(176, 0, 0) is None
+    True
+    '''
+    key = status << 14 | note << 7 | value
+    try:
+      return cls._events[key]
+    except KeyError:
+      pass
+
+    kind = status & 0xF0
+    if kind == 0x90 or kind == 0x80:
+      col, row = cls.map_midi_to_ui(note)
+      event = UIInputEvent(col, row, value if kind == 0x90 else 0)
+    elif kind == 0xB0 and note in cls.TOP_ROW_CONTROLLERS:
+      event = UIInputEvent(note - cls.TOP_ROW_CONTROLLERS[0], -1, value)
+    else:
+      return None
+    cls._events[key] = event
+    return event
+
+  def set(self, col, row, velocity=127, priority=UIDriver.BULK):
     '''Sets the value of a light in the MIDI device's grid.'''
-    index = self.map_ui_to_midi(col, row)
-    self.write_queue.append([[144, index, velocity, 0], pypm.Time()])
+    self.output.put(self.map_ui_to_midi(col, row), velocity, priority)
 
   def clear(self, col=None, row=None):
     '''Clears the value of a light in the MIDI device's grid.'''
     if col is None and row is None:
-      t = pypm.Time()
-      self.write_queue += [ [[144, index, 0, 0], t] for index in range(8*16) ]
+      for index in range(8*16):
+        self.output.put(index, 0)
     else:
-      index = self.map_ui_to_midi(col, row)
-      self.write_queue.append([[144, index, 0, 0], pypm.Time()])
+      self.output.put(self.map_ui_to_midi(col, row), 0)
+
+  def write(self, messages):
+    t = self.time()
+    self.out_device.Write([[[144, index, velocity, 0], t] for index, velocity in messages])
 
   def commit(self):
     '''Writes out the MIDI commands set up in set() and clear().  This must be called for those methods to take any actual effect.'''
-    self.out_device.Write(self.write_queue)
-    del self.write_queue[:]
+    self.output.flush()
+
+  def commit_async(self, priority=None):
+    '''Writes out the pending MIDI commands as fast as the link allows, letting other tasks run while it waits.  Updates made in the meantime are merged in, with interactive ones going first.  Given a priority, it returns as soon as the updates of that priority are out.'''
+    while self.output.pending(priority):
+      if not self.output.send():
+        yield self.output.delay()
 
   def close(self):
     self.in_device.Close()
@@ -204,24 +446,268 @@ class MidiLifeView(LifeView):
       ui_driver = args[0]
       args = args[1:]
     self.ui_driver = ui_driver
+    self.model = None
+    # Cells changed since the last render, and what the device is currently showing.
+    self.dirty = set()
+    self.shown = {}
+    # Cells changed by input handlers, shown ahead of simulation updates.
+    self.edited = set()
+    self.handling_input = False
 
     super(MidiLifeView, self).__init__(*args, **kwargs)
 
   def setitem(self, o, i, v):
     if type(i) is str and i == 'paused':
-      self.ui_driver.set(8, 0, 127 if bool(v) else 1)
+      self.ui_driver.set(8, 0, 127 if bool(v) else 1, UIDriver.INTERACTIVE)
     elif type(i) is tuple:
-      self.ui_driver.set(i[0], i[1], v)
-
-    self.ui_driver.commit()
+      self.model = o
+      self.dirty.add(i)
+      if self.handling_input:
+        self.edited.add(i)
+
+  def render(self):
+    '''Queues the net change since the last render.  Cells that changed and then changed back in between are not sent.
+
+    >>> m = BoundLifeModel(3, 3)
+    >>> v = MidiLifeView(DebugDriver(None))
+    >>> m.add_listener(v.setitem)
+    >>> m[0, 0] = 1
+    >>> m[1, 1] = 1
+    >>> v.render()
+    set(0, 0, 1)
+    set(1, 1, 1)
+    2
+    >>> m[1, 1] = 0
+    >>> m[1, 1] = 1
+    >>> m[2, 1] = 1
+    >>> v.render()
+    set(2, 1, 1)
+    1
+    '''
+    count = 0
+    for i in sorted(self.dirty):
+      v = self.model[i]
+      if self.shown.get(i) != v:
+        priority = UIDriver.INTERACTIVE if i in self.edited else UIDriver.BULK
+        self.ui_driver.set(i[0], i[1], self.model.rule.velocities[v], priority)
+        self.shown[i] = v
+        count += 1
+    self.dirty.clear()
+    self.edited.clear()
+    return count
+
+  def commit(self, priority=None):
+    '''Coroutine that sends the changes made since the last commit to the device, or only those of one priority.'''
+    return self.ui_driver.commit_async(priority)
 
   def handle_input(self):
-    for event in self.ui_driver.get():
-      for listener in self.listeners:
-        listener(self, event)
+    '''Coroutine that waits for input, passes it to the listeners and shows the result.'''
+    events = yield self.ui_driver.get_async()
+    self.handling_input = True
+    try:
+      for event in events:
+        for listener in self.listeners:
+          listener(self, event)
+    finally:
+      self.handling_input = False
+    # Show edits right away rather than waiting for the next frame.  Only wait for them to go out, not for a
+    # backlog of simulation updates, so the next input is read promptly; the render task drains the rest.
+    self.render()
+    yield self.commit(UIDriver.INTERACTIVE)
+
+class TerminalLifeView(LifeView):
+  '''Draws the model in a terminal at its own refresh rate.  Only cells that changed since the last refresh are redrawn, using cursor-addressed ANSI escapes.  The board stays at the top of the screen while other output scrolls underneath it.  When the output isn't a terminal, such as a piped log, whole boards are printed instead.
+
+  >>> import StringIO
+  >>> m = BoundLifeModel(3, 2)
+  >>> out = StringIO.StringIO()
+  >>> v = TerminalLifeView(out, ansi=True)
+  >>> m.add_listener(v.setitem)
+  >>> m[0, 0] = 1
+  >>> v.render()
+  6
+  >>> out.getvalue()
+  '\\x1b[2J\\x1b[5r\\x1b[1;1H#\\x1b[1;3H.\\x1b[1;5H.\\x1b[2;1H.\\x1b[2;3H.\\x1b[2;5H.\\x1b[5;1H'
+  >>> out.truncate(0)
+  >>> m[1, 1] = 1
+  >>> m['paused'] = True
+  >>> v.render()
+  1
+  >>> out.getvalue()
+  '\\x1b7\\x1b[2;3H#\\x1b[3;1H\\x1b[Kpaused\\x1b8'
+  >>> v.render()
+  0
+  '''
+  # Characters for each cell state.  Generations states past the end use the last one.
+  STATE_CHARS = '.#%+:-'
+
+  def __init__(self, out=None, rate=10, ansi=None, *args, **kwargs):
+    super(TerminalLifeView, self).__init__(*args, **kwargs)
+    self.out = out if out is not None else sys.stdout
+    self.rate = rate
+    if ansi is None:
+      ansi = hasattr(self.out, 'isatty') and self.out.isatty()
+    self.ansi = ansi
+    self.model = None
+    self.dirty = set()
+    self.shown = {}
+    self.paused = False
+    self.paused_changed = False
+    self.drawn = False
+
+  def setitem(self, o, i, v):
+    if type(i) is str and i == 'paused':
+      self.paused = bool(v)
+      self.paused_changed = True
+    elif type(i) is tuple:
+      self.model = o
+      self.dirty.add(i)
+
+  def render(self):
+    '''Redraws the cells changed since the last render.  Returns the number of cells drawn.'''
+    if self.model is None or not (self.dirty or self.paused_changed):
+      return 0
+    if not self.ansi:
+      self.out.write('{0}{1}\n\n'.format(self.model, ' (paused)' if self.paused else ''))
+      self.out.flush()
+      count = len(self.dirty)
+      self.dirty.clear()
+      self.paused_changed = False
+      return count
+
+    m = self.model
+    if self.drawn:
+      # Save the cursor so output scrolling below the board isn't disturbed.
+      parts = ['\x1b7']
+      cells = sorted(self.dirty, key=lambda i: (i[1], i[0]))
+    else:
+      # Clear the screen and keep scrolling output below the board and status line.
+      parts = ['\x1b[2J\x1b[{0}r'.format(m.height + 3)]
+      cells = [(c, r) for r in range(m.height) for c in range(m.width)]
+      self.shown.clear()
+
+    count = 0
+    chars = self.STATE_CHARS
+    for col, row in cells:
+      v = m.model[row][col]
+      if self.shown.get((col, row)) != v:
+        self.shown[col, row] = v
+        parts.append('\x1b[{0};{1}H{2}'.format(row + 1, col * 2 + 1, chars[min(v, len(chars) - 1)]))
+        count += 1
+
+    if self.paused_changed:
+      parts.append('\x1b[{0};1H\x1b[K{1}'.format(m.height + 1, 'paused' if self.paused else ''))
+
+    if self.drawn:
+      parts.append('\x1b8')
+    else:
+      parts.append('\x1b[{0};1H'.format(m.height + 3))
+      self.drawn = True
+
+    self.out.write(''.join(parts))
+    self.out.flush()
+    self.dirty.clear()
+    self.paused_changed = False
+    return count
+
+  def run(self):
+    '''Coroutine that redraws the board rate times a second.'''
+    try:
+      while True:
+        self.render()
+        yield 1.0 / self.rate
+    finally:
+      self.close()
+
+  def close(self):
+    if self.ansi and self.drawn:
+      # Restore full screen scrolling.
+      self.out.write('\x1b[r')
+      self.out.flush()
+      self.drawn = False
+
+class LifeRule(object):
+  '''A Life-like rule given as a B/S rulestring, optionally with a Generations state count.
+
+  The rule is compiled once into table[state][neighbors] giving the next state of a cell, so every engine evaluates any rule with a single lookup per cell.  Only cells in state 1 count as live neighbors; Generations states 2 and up are dying cells that fade back to 0.
+
+  >>> r = LifeRule('B3/S23')
+  >>> r.table[0]
+  (0, 0, 0, 1, 0, 0, 0, 0, 0)
+  >>> r.table[1]
+  (0, 0, 1, 1, 0, 0, 0, 0, 0)
+  >>> LifeRule('23/36').rulestring
+  'B36/S23'
+  >>> r = LifeRule('B2/S/C3')
+  >>> r.states, r.rulestring
+  (3, 'B2/S/C3')
+  >>> r.table[1][2], r.table[2][2], r.table[0][2]
+  (2, 0, 1)
+  >>> LifeRule('345/2/4').rulestring
+  'B2/S345/C4'
+  >>> LifeRule('B9/S23')
+  Traceback (most recent call last):
+      ...
+  ValueError: Invalid rulestring: 'B9/S23'
+  >>> LifeRule('B3/C3')
+  Traceback (most recent call last):
+      ...
+  ValueError: Invalid rulestring: 'B3/C3'
+  '''
+  # Launchpad velocities for Generations states: live cells are green and fade through amber to red.
+  GENERATIONS_VELOCITIES = (60, 63, 47, 15, 14, 13)
+
+  def __init__(self, rulestring='B3/S23'):
+    self.birth, self.survival, self.states = self.parse(rulestring)
+    self.rulestring = 'B{0}/S{1}'.format(''.join(str(n) for n in self.birth), ''.join(str(n) for n in self.survival))
+    if self.states > 2:
+      self.rulestring += '/C{0}'.format(self.states)
+
+    dying = 2 if self.states > 2 else 0
+    table = [tuple(1 if n in self.birth else 0 for n in range(9)),
+      tuple(1 if n in self.survival else dying for n in range(9))]
+    for state in range(2, self.states):
+      table.append((state + 1 if state + 1 < self.states else 0,) * 9)
+    self.table = tuple(table)
+
+    if self.states == 2:
+      self.velocities = (0, 1)
+    else:
+      v = self.GENERATIONS_VELOCITIES
+      self.velocities = (0,) + tuple(v[min(i, len(v) - 1)] for i in range(self.states - 1))
+
+  @classmethod
+  def parse(cls, rulestring):
+    '''Parses "B3/S23" or "B2/S/C3" style rulestrings as well as the older positional "S/B" and "S/B/C" forms into (birth, survival, states).'''
+    parts = rulestring.strip().upper().split('/')
+    fields = {}
+    try:
+      if all(p[:1] in ('B', 'S', 'C') for p in parts):
+        for p in parts:
+          fields[p[0]] = p[1:]
+      elif len(parts) in (2, 3):
+        fields = dict(zip('SBC', parts))
+      else:
+        raise ValueError()
+
+      if not set('BS') <= set(fields) or len(fields) != len(parts):
+        raise ValueError()
+      birth = sorted(set(int(n) for n in fields['B']))
+      survival = sorted(set(int(n) for n in fields['S']))
+      states = int(fields.get('C') or 2)
+      if max(birth + survival + [0]) > 8 or states < 2:
+        raise ValueError()
+    except ValueError:
+      raise ValueError("Invalid rulestring: {0!r}".format(rulestring))
+    return (tuple(birth), tuple(survival), states)
+
+  def __str__(self):
+    return self.rulestring
+
+CONWAY = LifeRule('B3/S23')
 
 class LifeModel(object):
-  def __init__(self, width, height, data=None):
+  def __init__(self, width, height, data=None, rule=None):
     '''
     >>> m = LifeModel(5, 5)
     >>> m[0, 0]
@@ -241,6 +727,11 @@ class LifeModel(object):
     '''
     self.width = width
     self.height = height
+    if rule is None:
+      rule = CONWAY
+    elif not isinstance(rule, LifeRule):
+      rule = LifeRule(rule)
+    self.rule = rule
     if data is None:
       self.model = [[0 for c in range(width)] for r in range(height)]
     else:
@@ -382,8 +873,17 @@ class LifeModel(object):
 
     self.model[row][col] = value
 
-  def perturb(self, count=10):
-    rand = random.Random()
+  def perturb(self, count=10, seed=None):
+    '''Sets count random cells alive.  Passing a seed makes the result reproducible, e.g. to replay a soup found by --census.
+
+    >>> a = LifeModel(8, 8)
+    >>> a.perturb(30, seed=42)
+    >>> b = LifeModel(8, 8)
+    >>> b.perturb(30, seed=42)
+    >>> a == b
+    True
+    '''
+    rand = random.Random(seed)
     coords = set()
     while len(coords) < count:
       r = rand.randint(0, self.height-1)
@@ -482,7 +982,7 @@ class LifeModel(object):
           candidates.add((c, r))
     candidates.remove((col, row))
 
-    return sum([data[c[1]][c[0]] for c in candidates])
+    return sum([1 for c in candidates if data[c[1]][c[0]] == 1])
 
   def __eq__(self, other):
     '''Checks that each element of two LifeModels is equal.
@@ -561,25 +1061,32 @@ class LifeModel(object):
      (0, 0, 1, 0, 0),
      (0, 0, 1, 0, 0),
      (0, 0, 0, 1, 1))
+    >>> m = LifeModel(4, 4, ( \
+        (0, 0, 0, 0), \
+        (0, 1, 1, 0), \
+        (0, 0, 0, 0), \
+        (0, 0, 0, 0)), rule='B2/S/C3')
+    >>> m.tick()
+    >>> print str(m)
+    ((0, 1, 1, 0),
+     (0, 2, 2, 0),
+     (0, 1, 1, 0),
+     (0, 0, 0, 0))
+    >>> m.tick()
+    >>> print str(m)
+    ((0, 2, 2, 0),
+     (1, 0, 0, 1),
+     (0, 2, 2, 0),
+     (0, 1, 1, 0))
     '''
     last_model = copy.deepcopy(self.model)
+    table = self.rule.table
     for row in range(self.height):
       for col in range(self.width):
         neighbors = self.count_neighbors(col, row, data=last_model)
-        if last_model[row][col] == 1:
-          if neighbors < 2: # underpopulated; die off
-            self[col, row] = 0
-          elif neighbors <= 3: # just right - stay alive
-            self[col, row] = 1
-            pass
-          else: # overpopulated; die off
-            self[col, row] = 0
-        else:
-          if neighbors == 3: # reproduction
-            self[col, row] = 1
-          else: # stay dead
-            self[col, row] = 0
-            pass
+        value = table[last_model[row][col]][neighbors]
+        if value != last_model[row][col]:
+          self[col, row] = value
 
   def __str__(self):
     return "({0})".format(",\n ".join(["({0})".format(", ".join([str(c) for c in row])) for row in self.model] ))
@@ -602,31 +1109,553 @@ class ItemBindingMixin(object):
 class BoundLifeModel(ItemBindingMixin, LifeModel):
   pass
 
+class LifeBatch(object):
+  '''Holds many independent, equally-sized Life boards and advances them all at once.
+
+  Storage is bit-sliced: there is one integer "plane" per cell (row-major) and bit k of a plane is that cell's value on board k.  The whole width x height x count volume lives in width*height integers so a single generation is a fixed number of bitwise operations per cell regardless of how many boards are in the batch.
+
+  >>> b = LifeBatch(3, 5, 5)
+  >>> b.set_board(1, LifeModel(5, 5, ( \
+      (0, 0, 0, 0, 0), \
+      (0, 0, 1, 0, 0), \
+      (0, 0, 1, 0, 0), \
+      (0, 0, 1, 0, 0), \
+      (0, 0, 0, 0, 0))))
+  >>> b.set_board(2, LifeModel(5, 5, ( \
+      (0, 0, 0, 0, 0), \
+      (0, 1, 1, 0, 0), \
+      (0, 1, 1, 0, 0), \
+      (0, 0, 0, 0, 0), \
+      (0, 0, 0, 0, 1))))
+  >>> b.population()
+  [0, 3, 5]
+  >>> b.tick()
+  >>> b.population()
+  [0, 3, 4]
+  >>> b.dead()
+  [True, False, False]
+  >>> b.stable()
+  [True, False, False]
+  >>> print str(b.get_board(1))
+  ((0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0),
+   (0, 1, 1, 1, 0),
+   (0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0))
+  >>> b.tick()
+  >>> b.stable()
+  [True, False, True]
+  >>> b.generation
+  2
+  '''
+  def __init__(self, count, width=8, height=8, rule=None):
+    if rule is None:
+      rule = CONWAY
+    elif not isinstance(rule, LifeRule):
+      rule = LifeRule(rule)
+    if rule.states != 2:
+      raise ValueError("LifeBatch only supports two-state rules, not {0}.".format(rule))
+    self.rule = rule
+    # The rule table as bit patterns of the neighbor counts that give a live cell.
+    self._birth = [(n & 1, n >> 1 & 1, n >> 2 & 1, n >> 3) for n in range(9) if rule.table[0][n]]
+    self._survival = [(n & 1, n >> 1 & 1, n >> 2 & 1, n >> 3) for n in range(9) if rule.table[1][n]]
+    self.count = count
+    self.width = width
+    self.height = height
+    self.mask = (1 << count) - 1
+    self.planes = [0] * (width * height)
+    self.generation = 0
+    self._changed = self.mask
+
+    # Neighbor plane indices for each cell.  Edges do not wrap, as in LifeModel.
+    self._neighbors = []
+    for row in range(height):
+      for col in range(width):
+        self._neighbors.append([r * width + c
+          for r in range(row-1, row+2) for c in range(col-1, col+2)
+          if (c, r) != (col, row) and 0 <= r < height and 0 <= c < width])
+
+  def _check_index(self, k):
+    if k < 0:
+      k += self.count
+    if k < 0 or k >= self.count:
+      raise IndexError("Board index out of range.")
+    return k
+
+  def get_board(self, k, model_class=LifeModel):
+    '''Extracts board k as a stand-alone model, e.g. a BoundLifeModel for display.'''
+    k = self._check_index(k)
+    m = model_class(self.width, self.height, rule=self.rule)
+    for i, plane in enumerate(self.planes):
+      if (plane >> k) & 1:
+        m[i % self.width, i // self.width] = 1
+    return m
+
+  def set_board(self, k, model):
+    '''Copies the cells of a model (anything indexable by [col, row]) into board k.'''
+    k = self._check_index(k)
+    bit = 1 << k
+    for i in range(len(self.planes)):
+      if model[i % self.width, i // self.width]:
+        self.planes[i] |= bit
+      else:
+        self.planes[i] &= ~bit
+    self._changed |= bit
+
+  def perturb(self, count=10, rand=None):
+    '''Seeds every board with count random live cells, as LifeModel.perturb does for one board.'''
+    if rand is None:
+      rand = random.Random()
+    cells = len(self.planes)
+    for k in range(self.count):
+      bit = 1 << k
+      for i in rand.sample(range(cells), min(count, cells)):
+        self.planes[i] |= bit
+    self._changed = self.mask
+
+  def tick(self):
+    '''Advances every board in the batch by one generation.'''
+    old = self.planes
+    new = []
+    changed = 0
+    mask = self.mask
+    birth = self._birth
+    survival = self._survival
+    for i, neighbors in enumerate(self._neighbors):
+      # Bit-sliced four bit neighbor count per board.
+      s0 = s1 = s2 = s3 = 0
+      for n in neighbors:
+        p = old[n]
+        c = s0 & p
+        s0 ^= p
+        c, s1 = s1 & c, s1 ^ c
+        c, s2 = s2 & c, s2 ^ c
+        s3 |= c
+      b0, b1, b2, b3 = (s0 ^ mask, s0), (s1 ^ mask, s1), (s2 ^ mask, s2), (s3 ^ mask, s3)
+      b = 0
+      for t0, t1, t2, t3 in birth:
+        b |= b0[t0] & b1[t1] & b2[t2] & b3[t3]
+      a = 0
+      for t0, t1, t2, t3 in survival:
+        a |= b0[t0] & b1[t1] & b2[t2] & b3[t3]
+      alive = old[i]
+      v = (alive & a) | (b & ~alive & mask)
+      new.append(v)
+      changed |= v ^ alive
+    self.planes = new
+    self._changed = changed
+    self.generation += 1
+
+  def alive_mask(self):
+    '''Returns an int with bit k set if board k has any live cells.'''
+    alive = 0
+    for plane in self.planes:
+      alive |= plane
+    return alive
+
+  def _flags(self, mask):
+    return [bool((mask >> k) & 1) for k in range(self.count)]
+
+  def population(self):
+    '''Returns the number of live cells on each board.'''
+    columns = [format(plane, '0{0}b'.format(self.count)) for plane in self.planes]
+    return [column.count('1') for column in zip(*columns)][::-1]
+
+  def dead(self):
+    '''Returns, per board, whether every cell is dead.'''
+    return self._flags(~self.alive_mask() & self.mask)
+
+  def stable(self):
+    '''Returns, per board, whether the last tick() left the board unchanged.'''
+    return self._flags(~self._changed & self.mask)
+
+  def keys(self):
+    '''Returns each board as an int with bit i set if cell i (row-major) is alive, for telling generations apart.'''
+    keys = [0] * self.count
+    for i, plane in enumerate(self.planes):
+      bit = 1 << i
+      while plane:
+        low = plane & -plane
+        keys[low.bit_length() - 1] |= bit
+        plane ^= low
+    return keys
+
+  def select(self, indices):
+    '''Returns a new batch holding just the listed boards, in that order, at the same generation.
+
+    >>> b = LifeBatch(3, 2, 2)
+    >>> b.planes = [0b101, 0b110, 0, 0b100]
+    >>> b.keys()
+    [1, 2, 11]
+    >>> b.select([2, 0]).keys()
+    [11, 1]
+    '''
+    batch = LifeBatch(len(indices), self.width, self.height, self.rule)
+    for i, plane in enumerate(self.planes):
+      p = 0
+      for j, k in enumerate(indices):
+        p |= ((plane >> k) & 1) << j
+      batch.planes[i] = p
+    batch.generation = self.generation
+    return batch
+
+  def same_mask(self, planes):
+    '''Returns an int with bit k set if board k equals board k of a previous snapshot of self.planes.'''
+    diff = 0
+    for a, b in zip(self.planes, planes):
+      diff |= a ^ b
+    return ~diff & self.mask
+
+
+CENSUS_DIES = 'dies'
+CENSUS_STABILIZES = 'stabilizes'
+CENSUS_OSCILLATES = 'oscillates'
+CENSUS_UNRESOLVED = 'unresolved'
+
+def census_soups(seeds, width=8, height=8, cells=30, max_generations=1000, rule=None, max_period=64):
+  '''Runs the soups made by LifeModel.perturb(cells, seed) for each seed until they repeat.
+
+  Returns a (seed, result, period, lifespan) tuple per soup.  The lifespan is the generation at which the soup first entered its final cycle.  Soups that have not repeated within max_generations, or whose period is longer than max_period, are reported as unresolved.  Every generation of each soup is remembered, so cycles of any length are found, and soups stop being stepped once they repeat so a slow one doesn't hold up the rest.
+
+  >>> census_soups([0], 5, 5, 0)
+  [(0, 'dies', 1, 0)]
+  >>> census_soups([7, 4, 6], 5, 5, 12)
+  [(7, 'dies', 1, 20), (4, 'oscillates', 2, 7), (6, 'stabilizes', 1, 2)]
+  >>> m = LifeModel(5, 5)
+  >>> m.perturb(12, seed=7)
+  >>> for i in range(20): m.tick()
+  >>> print str(m)
+  ((0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0),
+   (0, 0, 0, 0, 0))
+  '''
+  batch = LifeBatch(len(seeds), width, height, rule)
+  for k, seed in enumerate(seeds):
+    m = LifeModel(width, height)
+    m.perturb(cells, seed=seed)
+    batch.set_board(k, m)
+
+  results = [None] * len(seeds)
+  # The original index of each board in the batch, and the generation each soup was first in each of its states.
+  boards = range(len(seeds))
+  seen = [{key: 0} for key in batch.keys()]
+  while batch.count and batch.generation < max_generations:
+    batch.tick()
+    generation = batch.generation
+    running = []
+    for j, key in enumerate(batch.keys()):
+      k = boards[j]
+      if seen[k] is None:
+        # Finished, waiting to be dropped from the batch.
+        continue
+      first = seen[k].get(key)
+      if first is None:
+        seen[k][key] = generation
+        running.append(j)
+        continue
+      period = generation - first
+      if period > max_period:
+        results[k] = (seeds[k], CENSUS_UNRESOLVED, 0, generation)
+      elif key == 0:
+        results[k] = (seeds[k], CENSUS_DIES, period, first)
+      elif period == 1:
+        results[k] = (seeds[k], CENSUS_STABILIZES, period, first)
+      else:
+        results[k] = (seeds[k], CENSUS_OSCILLATES, period, first)
+      seen[k] = None
+    # Drop finished soups once they're half the batch; a smaller batch ticks faster.
+    if len(running) <= batch.count // 2:
+      batch = batch.select(running)
+      boards = [boards[j] for j in running]
+
+  for k in range(len(seeds)):
+    if results[k] is None:
+      results[k] = (seeds[k], CENSUS_UNRESOLVED, 0, batch.generation)
+  return results
+
+def _census_worker(args):
+  '''Process pool entry point; returns the worker's pid and timing along with its results.'''
+  start = time.time()
+  results = census_soups(*args)
+  return (os.getpid(), time.time() - start, results)
+
+def census_header(config):
+  '''Returns the first line of a census results file, recording the settings its soups were run with.'''
+  return '# census rule={0} width={1} height={2} cells={3} max_generations={4} max_period={5}\n'.format(
+    config.rule, config.width, config.height, config.soup_cells, config.max_generations, config.max_period)
+
+def read_census(filename):
+  '''Reads a census results file, returning its header line (None if it's empty or missing) and the set of seeds already recorded.  Truncated lines from an interrupted run are ignored.
+
+  >>> import tempfile
+  >>> f = tempfile.NamedTemporaryFile(delete=False)
+  >>> f.write('# census rule=B3/S23\\n3 dies 1 4\\n5 stabilizes 1 2\\n7 di'); f.close()
+  >>> read_census(f.name)
+  ('# census rule=B3/S23\\n', set([3, 5]))
+  >>> os.remove(f.name)
+  '''
+  header = None
+  done = set()
+  if not os.path.exists(filename):
+    return header, done
+  with open(filename) as f:
+    for line in f:
+      if line.startswith('#'):
+        if header is None:
+          header = line
+        continue
+      fields = line.split()
+      if len(fields) == 4 and line.endswith('\n'):
+        done.add(int(fields[0]))
+  return header, done
+
+def _trim_census(filename, block=4096):
+  '''Cuts off a partial last line left by a run that was killed mid-write, so new results don't get appended onto it.
+
+  >>> import tempfile
+  >>> f = tempfile.NamedTemporaryFile(delete=False)
+  >>> f.write('10 dies 1 5\\n12'); f.close()
+  >>> _trim_census(f.name)
+  >>> open(f.name).read()
+  '10 dies 1 5\\n'
+  >>> os.remove(f.name)
+  '''
+  if not os.path.exists(filename):
+    return
+  with open(filename, 'r+b') as f:
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    pos = end
+    while pos > 0:
+      start = max(0, pos - block)
+      f.seek(start)
+      i = f.read(pos - start).rfind('\n')
+      if i >= 0:
+        pos = start + i + 1
+        break
+      pos = start
+    if pos < end:
+      f.truncate(pos)
+
+def census(config):
+  '''Classifies config.census soups across a process pool, appending results to config.census_file.  Seeds already present in the file are skipped so an interrupted census can simply be run again.'''
+  if config.rule.states != 2:
+    raise ValueError('The census only supports two-state rules, not {0}.'.format(config.rule))
+  _trim_census(config.census_file)
+  header, done = read_census(config.census_file)
+  if header is None and done:
+    raise ValueError("{0} doesn't record the settings its soups were run with; use another --census-file.".format(config.census_file))
+  if header is not None and header != census_header(config):
+    raise ValueError('{0} was run with different settings ({1}); use another --census-file.'.format(
+      config.census_file, header[2:].strip()))
+  seeds = [s for s in xrange(config.seed, config.seed + config.census) if s not in done]
+  print('census: {0} soups to run, {1} already recorded'.format(len(seeds), config.census - len(seeds)))
+
+  chunk = config.chunk_size
+  jobs = [(seeds[i:i+chunk], config.width, config.height, config.soup_cells, config.max_generations, config.rule, config.max_period)
+    for i in xrange(0, len(seeds), chunk)]
+
+  throughput = {}
+  pool = multiprocessing.Pool(config.workers)
+  try:
+    with open(config.census_file, 'a') as out:
+      if header is None:
+        out.write(census_header(config))
+      completed = 0
+      for pid, elapsed, results in pool.imap_unordered(_census_worker, jobs):
+        out.writelines('{0} {1} {2} {3}\n'.format(*r) for r in results)
+        out.flush()
+
+        count, total = throughput.get(pid, (0, 0.0))
+        throughput[pid] = (count + len(results), total + elapsed)
+        completed += len(results)
+        if config.verbose:
+          print('census: {0}/{1} soups'.format(completed, len(seeds)))
+    pool.close()
+  except KeyboardInterrupt:
+    print('census: interrupted; run again to resume.')
+    pool.terminate()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+
+  for pid, (count, total) in sorted(throughput.items()):
+    print('worker {0}: {1} soups in {2:.1f}s ({3:.0f} soups/s)'.format(pid, count, total, count / total if total else 0))
+
 class Life(object):
-  def __init__(self, uidriver, width=8, height=8):
-    self.model = BoundLifeModel(width, height)
+  # How often a paused simulation checks whether it has been resumed.
+  pause_poll = 0.1
+  # Longest a full speed simulation runs, and the most generations it ticks, before letting other tasks have a turn.
+  time_slice = 0.01
+  burst_limit = 1000
+  # How often the achieved rates are printed.
+  report_interval = 5
+
+  # Generations per second and frames per second stepped through with the side buttons.  None means as fast as possible.
+  SIM_RATES = (0.5, 1, 2, 5, 10, 25, 100, None)
+  RENDER_RATES = (2, 5, 10, 20, 30, 60)
+
+  def __init__(self, uidriver, width=8, height=8, rule=None, pattern=None, render_rate=20, terminal=True, terminal_rate=10, share=None):
+    '''Sets up a simulation shown on uidriver.  It's also drawn in the terminal unless terminal is False, as for headless runs, and published as a shared board called share if given.'''
+    self.sim_rate = 1
+    self.render_rate = render_rate
+    self.clock = time.time
+    self.generations = 0
+    self.frames = 0
+    self.model = BoundLifeModel(width, height, rule=rule)
     #self.model.add_listener(PrintingLifeView().setitem)
     self.view = MidiLifeView(uidriver)
     self.view.add_listener(self.input_handler)
     self.model.add_listener(self.view.setitem)
-    self.model.perturb(30)
+    self.shared = None
+    if share:
+      self.shared = sharedboard.SharedBoardWriter(width, height, share)
+    self.terminal = None
+    if terminal:
+      self.terminal = TerminalLifeView(rate=terminal_rate, width=width, height=height)
+      self.model.add_listener(self.terminal.setitem)
+    if pattern is None:
+      self.model.perturb(30)
+    else:
+      self.load(pattern)
+
+  def load(self, pattern):
+    '''Replaces the board with a pattern file and shows it.  A rule named in the file that differs from the one running, or isn't understood, only gets a warning.
+
+    >>> import StringIO
+    >>> life = Life(UIDriver(), terminal=False)
+    >>> life.load(StringIO.StringIO('x = 3, y = 1, rule = B3/S23:T20,20\\n3o!'))
+    >>> f = StringIO.StringIO('x = 3, y = 1, rule = Life\\n3o!')
+    >>> f.name = 'life.rle'
+    >>> life.load(f)
+    warning: life.rle is for rule Life but running B3/S23
+    '''
+    rule = patterns.load_pattern(pattern, self.model)
+    if rule is not None:
+      # Golly follows the rule with a topology, as in B3/S23:T20,20.
+      rule = rule.split(':')[0]
+      try:
+        same = LifeRule(rule).rulestring == self.model.rule.rulestring
+      except ValueError:
+        same = False
+      if not same:
+        print('warning: {0} is for rule {1} but running {2}'.format(getattr(pattern, 'name', pattern), rule, self.model.rule))
+    # Set every cell again so all the listeners see the new board.
+    for row in range(self.model.height):
+      for col in range(self.model.width):
+        self.model[col, row] = self.model[col, row]
+
+  def save(self, filename):
+    patterns.save_pattern(self.model, filename)
 
   def run(self, speed=1):
-    '''Runs a Life simulation and displays it in a view.'''
-    # Link a View to our data model
-    # Loop, ticking the simulation each second
+    '''Runs a Life simulation and displays it in a view.  speed is the number of seconds per generation; 0 runs as fast as possible.'''
+    runtime = Runtime()
+    self.start(runtime, speed)
+    try:
+      runtime.run()
+    finally:
+      self.close()
+
+  def close(self):
+    if self.shared:
+      self.shared.close()
+      self.shared = None
+
+  def publish(self):
+    '''Publishes the board to the shared board, if there is one.'''
+    if self.shared:
+      self.shared.publish(self.model.model, self.generations)
+
+  def start(self, runtime, speed=1):
+    '''Adds the simulation, rendering and input handling to a runtime, which may be shared with other toys.'''
+    self.sim_rate = 1.0 / speed if speed else None
+    self.clock = runtime.clock
+    runtime.spawn(self.simulate(), 'life.simulate')
+    runtime.spawn(self.render(), 'life.render')
+    runtime.spawn(self.handle_input(), 'life.input')
+    runtime.spawn(self.report(), 'life.report')
+    if self.terminal:
+      runtime.spawn(self.terminal.run(), 'life.terminal')
+
+  def simulate(self):
+    '''Coroutine that advances the simulation at sim_rate generations per second, independently of rendering.'''
     print 'running'
-    next_tick = time.time()
+    self.publish()
+    next_tick = self.clock()
+    while True:
+      if self.model['paused']:
+        yield self.pause_poll
+        next_tick = self.clock()
+        continue
+
+      if self.sim_rate is None:
+        # Tick for a time slice then let rendering and input have a turn.
+        end = self.clock() + self.time_slice
+        for i in xrange(self.burst_limit):
+          if self.clock() >= end or self.model['paused']:
+            break
+          self.model.tick()
+          self.generations += 1
+          self.publish()
+        yield
+        continue
+
+      self.model.tick()
+      self.generations += 1
+      self.publish()
+      next_tick = max(next_tick + 1.0 / self.sim_rate, self.clock())
+      yield next_tick - self.clock()
+
+  def render(self):
+    '''Coroutine that shows the board at render_rate frames per second.  Generations ticked in between frames are skipped; only the net change is sent.'''
+    next_frame = self.clock()
+    while True:
+      if self.view.render():
+        yield self.view.commit()
+      self.frames += 1
+      next_frame = max(next_frame + 1.0 / self.render_rate, self.clock())
+      yield next_frame - self.clock()
+
+  def report(self):
+    '''Coroutine that prints the achieved generations per second against frames per second.'''
     while True:
-      now = time.time()
-      if now >= next_tick and not self.model['paused']:
-        next_tick = now + speed
-        self.model.tick()
-        print(self.model)
-        print
+      start, generations, frames = self.clock(), self.generations, self.frames
+      yield self.report_interval
+      elapsed = self.clock() - start
+      print('life: {0:.1f} generations/s, {1:.1f} frames/s'.format(
+        (self.generations - generations) / elapsed, (self.frames - frames) / elapsed))
 
-      self.view.handle_input()
-      time.sleep(0.1)
+  def step_rate(self, rates, current, step):
+    '''Returns the rate step places along rates from current.
+
+    >>> life = Life(UIDriver())
+    >>> life.step_rate(Life.SIM_RATES, 1, 1)
+    2
+    >>> life.step_rate(Life.SIM_RATES, 100, 1) is None
+    True
+    >>> life.step_rate(Life.SIM_RATES, None, 1) is None
+    True
+    >>> life.step_rate(Life.RENDER_RATES, 7, -1)
+    5
+    '''
+    if current in rates:
+      i = rates.index(current) + step
+    else:
+      # Snap a rate that isn't one of the steps to its neighbor in the direction of travel.
+      i = len([r for r in rates if r is not None and r < current])
+      if step < 0:
+        i -= 1
+    return rates[max(0, min(i, len(rates) - 1))]
+
+  def handle_input(self):
+    while True:
+      yield self.view.handle_input()
+      self.publish()
 
   def input_handler(self, source, uievent):
     if uievent.value == 0:
@@ -638,6 +1667,12 @@ class Life(object):
       self.model[uievent.col, uievent.row] = 1 if v == 0 else 0
     elif uievent.col == 8 and uievent.row == 0:
       self.model['paused'] = not self.model['paused']
+    elif uievent.col == 8 and uievent.row in (1, 2):
+      self.sim_rate = self.step_rate(self.SIM_RATES, self.sim_rate, 1 if uievent.row == 1 else -1)
+      print('simulation rate: {0} generations/s'.format(self.sim_rate or 'max'))
+    elif uievent.col == 8 and uievent.row in (3, 4):
+      self.render_rate = self.step_rate(self.RENDER_RATES, self.render_rate, 1 if uievent.row == 3 else -1)
+      print('render rate: {0} frames/s'.format(self.render_rate))
 
 
 def find_device(dev_name):
@@ -656,11 +1691,30 @@ def find_device(dev_name):
 def test():
   import unittest, doctest
   doctest.testmod()
+  doctest.testmod(patterns)
+  doctest.testmod(runtime)
+  doctest.testmod(sharedboard)
+  import simulator
+  doctest.testmod(simulator)
 
 def clear(out_device):
   for i in range(9*16):
     out_device.Write([[[144, i, 0, 0], pypm.Time()]])
 
+def positive_float(value):
+  '''argparse type for rates that must be above zero.'''
+  f = float(value)
+  if f <= 0:
+    raise argparse.ArgumentTypeError('must be greater than 0, not {0}'.format(value))
+  return f
+
+def non_negative_float(value):
+  '''argparse type for rates where 0 means as fast as possible.'''
+  f = float(value)
+  if f < 0:
+    raise argparse.ArgumentTypeError('must not be negative, not {0}'.format(value))
+  return f
+
 def get_argparser():
   parser = argparse.ArgumentParser()
   parser.add_argument('--test', default=False, action='store_true')
@@ -669,14 +1723,66 @@ def get_argparser():
   parser.add_argument('--indevice', type=int)
   parser.add_argument('--outdevice', type=int)
   parser.add_argument('--verbose', '-v', action='store_true')
+  parser.add_argument('--rule', type=LifeRule, default='B3/S23', help='B/S rulestring, e.g. B36/S23, or a Generations rule such as B2/S/C3')
+  parser.add_argument('--pattern', help='start from an RLE, Life 1.06 or macrocell file instead of a random soup')
+  parser.add_argument('--save', metavar='FILE', help='save the board to a pattern file on exit')
+  parser.add_argument('--rate', type=non_negative_float, default=1, help='generations per second; 0 runs as fast as possible')
+  parser.add_argument('--fps', type=positive_float, default=20, help='frames per second sent to the device')
+  parser.add_argument('--bandwidth', type=positive_float, default=3125, help='bytes per second the MIDI link can carry')
+  parser.add_argument('--no-terminal', dest='terminal', action='store_false', help="don't draw the board in the terminal")
+  parser.add_argument('--terminal-fps', type=positive_float, default=10)
+  parser.add_argument('--share', metavar='NAME', help='publish the board as a shared board; watch it with python sharedboard.py NAME')
+  parser.add_argument('--simulate', type=float, metavar='SECONDS', help='run on a simulated Launchpad for SECONDS with random presses, then print the link counters')
+  parser.add_argument('--presses', type=int, default=20, help='random pad presses during --simulate')
+  parser.add_argument('--width', type=int, default=8)
+  parser.add_argument('--height', type=int, default=8)
+  parser.add_argument('--census', type=int, metavar='COUNT', help='classify COUNT random soups instead of running a device')
+  parser.add_argument('--census-file', default='census.txt', help='append-only census results; existing seeds are skipped')
+  parser.add_argument('--seed', type=int, default=0, help='first census seed')
+  parser.add_argument('--soup-cells', type=int, default=30)
+  parser.add_argument('--max-generations', type=int, default=1000)
+  parser.add_argument('--max-period', type=int, default=64, help='longest census oscillator period to classify; longer ones are reported as unresolved')
+  parser.add_argument('--chunk-size', type=int, default=256)
+  parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
   return parser
 
 def get_config():
-  return get_argparser().parse_args()
+  parser = get_argparser()
+  config = parser.parse_args()
+  if config.census and config.rule.states != 2:
+    parser.error('--census only supports two-state rules, not {0}'.format(config.rule))
+  return config
 
 def print_help():
   get_argparser().print_help()
 
+def simulate(config):
+  '''Runs Life on a LaunchpadSimulator, with no MIDI devices, and prints how the simulated link coped.'''
+  import simulator
+  launchpad = simulator.LaunchpadSimulator(config.bandwidth)
+  launchpad.random_presses(config.presses, config.simulate)
+  uidriver = simulator.SimulatedDriver(launchpad)
+  if config.verbose:
+    uidriver = DebugDriver(uidriver)
+
+  life = Life(uidriver, rule=config.rule, pattern=config.pattern, render_rate=config.fps,
+    terminal=config.terminal, terminal_rate=config.terminal_fps, share=config.share)
+  runtime = Runtime()
+  def stop():
+    yield config.simulate
+    runtime.stop()
+  life.start(runtime, 1.0 / config.rate if config.rate else 0)
+  runtime.spawn(stop(), 'simulate.stop')
+  try:
+    runtime.run()
+  finally:
+    life.close()
+    if config.save:
+      life.save(config.save)
+  print('simulated {0} generations, {1} frames'.format(life.generations, life.frames))
+  for name, value in launchpad.counters().items():
+    print('{0}: {1:.6g}'.format(name, value))
+
 def main(config):
   pypm.Initialize()
   if config.device:
@@ -698,16 +1804,21 @@ def main(config):
 #      pypm.Terminate()
 #      return
     print d
-    uidriver = MidiDriver(d[0], d[1])
+    uidriver = MidiDriver(d[0], d[1], config.bandwidth)
     if config.verbose:
       uidriver = DebugDriver(uidriver)
 
     try:
       time.sleep(2)
       print 'Life()'
-      life = Life(uidriver)
+      life = Life(uidriver, rule=config.rule, pattern=config.pattern, render_rate=config.fps,
+        terminal=config.terminal, terminal_rate=config.terminal_fps, share=config.share)
       print 'run()'
-      life.run(1)
+      try:
+        life.run(1.0 / config.rate if config.rate else 0)
+      finally:
+        if config.save:
+          life.save(config.save)
       print 'Done.'
     except Exception as e:
       traceback.print_exc()
@@ -725,6 +1836,10 @@ if __name__ == '__main__':
 
   if config.test:
     test()
+  elif config.census:
+    census(config)
+  elif config.simulate:
+    simulate(config)
   elif config.list:
     devs = MidiDriver.list_devices()
     i = 0
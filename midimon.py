@@ -24,7 +24,11 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import pypm, time
+import pypm
+from runtime import Runtime
+
+# How often the monitor checks for input.
+POLL_INTERVAL = 0.005
 
 def find_device():
   count = pypm.CountDevices()
@@ -42,6 +46,15 @@ def find_device():
         out_dev = pypm.Output(i)
   return (in_dev, out_dev)
 
+def monitor(in_dev, out_dev):
+  '''Coroutine that prints incoming events and echoes them back to the device.  It can share a Runtime with other toys.'''
+  while True:
+    while in_dev.Poll():
+      events = in_dev.Read(50)
+      print [(e[0][1], e[0][2]) for e in events]
+      out_dev.Write(events)
+    yield POLL_INTERVAL
+
 if __name__ == '__main__':
   pypm.Initialize()
 
@@ -50,12 +63,9 @@ if __name__ == '__main__':
   print 'Ready to read inputs.'
   if in_dev and out_dev:
     try:
-      while True:
-        while in_dev.Poll():
-          events = in_dev.Read(50)
-          print [(e[0][1], e[0][2]) for e in events]
-          out_dev.Write(events)
-        time.sleep(0.1)
+      runtime = Runtime()
+      runtime.spawn(monitor(in_dev, out_dev), 'midimon')
+      runtime.run()
     finally:
       pypm.Terminate()
   else:
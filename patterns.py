@@ -0,0 +1,448 @@
+# MidiPlayground - Life pattern files
+#
+# Latest version available at: https://github.com/j3hyde/midiplayground
+#
+# Copyright (c) 2015 Jeffrey Kyllo
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''Readers and writers for RLE, Life 1.06 and macrocell pattern files.
+
+Readers work a line at a time and write cells straight into a LifeModel's backing store, clipping anything that falls outside the board, so large files are never held in memory as a whole.  Writers likewise stream the board out a row or node at a time.
+'''
+
+import mmap, os, re
+
+RLE = 'rle'
+LIFE106 = 'life106'
+MACROCELL = 'mc'
+
+EXTENSIONS = {
+  '.rle': RLE,
+  '.lif': LIFE106,
+  '.life': LIFE106,
+  '.mc': MACROCELL,
+}
+
+class PatternError(ValueError):
+  pass
+
+class _Placer(object):
+  '''Writes runs of cells into a model, given in pattern coordinates relative to an origin on the board.'''
+  def __init__(self, model, origin_col, origin_row):
+    self.rows = model.model
+    self.width = model.width
+    self.height = model.height
+    self.states = model.rule.states
+    self.origin_col = origin_col
+    self.origin_row = origin_row
+
+  def put(self, x, y, state, run=1):
+    if state <= 0:
+      return
+    if state >= self.states:
+      raise PatternError("State {0} is not valid for a {1}-state rule.".format(state, self.states))
+    row = y + self.origin_row
+    if row < 0 or row >= self.height:
+      return
+    start = max(x + self.origin_col, 0)
+    end = min(x + self.origin_col + run, self.width)
+    cells = self.rows[row]
+    for col in range(start, end):
+      cells[col] = state
+
+def _clear(model):
+  for cells in model.model:
+    cells[:] = [0] * model.width
+
+def _lines(source):
+  '''Yields the lines of a file name or file object.  Named files are memory-mapped rather than read in.'''
+  if not isinstance(source, basestring):
+    for line in source:
+      yield line
+    return
+
+  with open(source, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return
+    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      for line in iter(m.readline, ''):
+        yield line
+    finally:
+      m.close()
+
+def sniff_format(source, first_line=''):
+  '''Guesses a pattern format from a file name, falling back to the first line of the file.
+
+  >>> sniff_format('glider.rle'), sniff_format('x.LIF'), sniff_format('big.mc')
+  ('rle', 'life106', 'mc')
+  >>> sniff_format(None, '[M2] (golly 2.6)')
+  'mc'
+  >>> sniff_format(None, '#Life 1.06')
+  'life106'
+  >>> sniff_format(None, 'x = 3, y = 3')
+  'rle'
+  '''
+  if isinstance(source, basestring):
+    ext = os.path.splitext(source)[1].lower()
+    if ext in EXTENSIONS:
+      return EXTENSIONS[ext]
+  if first_line.startswith('[M2]'):
+    return MACROCELL
+  if first_line.startswith('#Life 1.06'):
+    return LIFE106
+  return RLE
+
+def load_pattern(source, model, format=None):
+  '''Replaces the contents of model with a pattern from a file name or file object.  Returns the rulestring named in the file, if any.'''
+  lines = _lines(source)
+  first = next(lines, '')
+  if format is None:
+    format = sniff_format(source, first)
+
+  def all_lines():
+    yield first
+    for line in lines:
+      yield line
+
+  _clear(model)
+  return READERS[format](all_lines(), model)
+
+def save_pattern(model, dest, format=None):
+  '''Writes the contents of model to a file name or file object.'''
+  if format is None:
+    format = sniff_format(dest if isinstance(dest, basestring) else None)
+  if isinstance(dest, basestring):
+    with open(dest, 'w') as f:
+      WRITERS[format](model, f)
+  else:
+    WRITERS[format](model, dest)
+
+# RLE
+
+_RLE_HEADER = re.compile(r'x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?')
+_RLE_TOKEN = re.compile(r'(\d*)([a-zA-Z.$!])')
+
+def _rle_state(tag):
+  if tag in 'b.':
+    return 0
+  if tag == 'o':
+    return 1
+  if 'A' <= tag <= 'X':
+    return ord(tag) - ord('A') + 1
+  raise PatternError("Unsupported RLE cell tag: {0!r}".format(tag))
+
+def read_rle(lines, model):
+  '''Reads an RLE pattern into model, centered on the board.
+
+  >>> import life, StringIO
+  >>> m = life.LifeModel(5, 5)
+  >>> read_rle(StringIO.StringIO('#N Glider\\nx = 3, y = 3, rule = B3/S23\\nbo$2bo$3o!'), m)
+  'B3/S23'
+  >>> print str(m)
+  ((0, 0, 0, 0, 0),
+   (0, 0, 1, 0, 0),
+   (0, 0, 0, 1, 0),
+   (0, 1, 1, 1, 0),
+   (0, 0, 0, 0, 0))
+  '''
+  rule = None
+  placer = None
+  x = y = 0
+  for line in lines:
+    line = line.strip()
+    if not line or line.startswith('#'):
+      continue
+    if placer is None:
+      header = _RLE_HEADER.match(line)
+      if header is None:
+        raise PatternError("Missing RLE header line.")
+      rule = header.group(3)
+      placer = _Placer(model, (model.width - int(header.group(1))) // 2, (model.height - int(header.group(2))) // 2)
+      continue
+
+    for count, tag in _RLE_TOKEN.findall(line):
+      run = int(count) if count else 1
+      if tag == '!':
+        return rule
+      elif tag == '$':
+        x = 0
+        y += run
+        if y + placer.origin_row >= placer.height:
+          # Everything further down is off the board.
+          return rule
+      else:
+        placer.put(x, y, _rle_state(tag), run)
+        x += run
+  return rule
+
+def write_rle(model, out):
+  '''Writes model as RLE, one row at a time.
+
+  >>> import life, StringIO
+  >>> m = life.LifeModel(4, 3, ((0, 1, 0, 0), (0, 0, 1, 0), (1, 1, 1, 0)))
+  >>> f = StringIO.StringIO()
+  >>> write_rle(m, f)
+  >>> print f.getvalue().strip()
+  x = 4, y = 3, rule = B3/S23
+  bo$2bo$3o!
+  '''
+  states = model.rule.states
+  tags = 'bo' if states == 2 else '.' + ''.join(chr(ord('A') + s) for s in range(states - 1))
+  out.write('x = {0}, y = {1}, rule = {2}\n'.format(model.width, model.height, model.rule))
+
+  line = []
+  width = [0]
+  def emit(token):
+    if width[0] + len(token) > 70:
+      out.write(''.join(line) + '\n')
+      del line[:]
+      width[0] = 0
+    line.append(token)
+    width[0] += len(token)
+
+  def run(count, tag):
+    emit((str(count) if count > 1 else '') + tag)
+
+  newlines = 0
+  for cells in model.model:
+    # Drop trailing dead cells; runs of blank rows collapse into one '$' token.
+    end = len(cells)
+    while end > 0 and cells[end - 1] == 0:
+      end -= 1
+    if end > 0 and newlines > 0:
+      run(newlines, '$')
+      newlines = 0
+    newlines += 1
+
+    c = 0
+    while c < end:
+      state = cells[c]
+      n = 1
+      while c + n < end and cells[c + n] == state:
+        n += 1
+      run(n, tags[state])
+      c += n
+  emit('!')
+  out.write(''.join(line) + '\n')
+
+# Life 1.06
+
+def read_life106(lines, model):
+  '''Reads a Life 1.06 coordinate list into model with (0, 0) at the center of the board.
+
+  >>> import life, StringIO
+  >>> m = life.LifeModel(4, 4)
+  >>> read_life106(StringIO.StringIO('#Life 1.06\\n0 -1\\n1 0\\n-1 1\\n0 1\\n1 1\\n'), m)
+  >>> print str(m)
+  ((0, 0, 0, 0),
+   (0, 0, 1, 0),
+   (0, 0, 0, 1),
+   (0, 1, 1, 1))
+  '''
+  placer = _Placer(model, model.width // 2, model.height // 2)
+  for line in lines:
+    fields = line.split()
+    if not fields or fields[0].startswith('#'):
+      continue
+    try:
+      placer.put(int(fields[0]), int(fields[1]), 1)
+    except (ValueError, IndexError):
+      raise PatternError("Bad Life 1.06 line: {0!r}".format(line))
+
+def write_life106(model, out):
+  '''Writes the live cells of model as Life 1.06 coordinates relative to the center of the board.'''
+  if model.rule.states != 2:
+    raise PatternError("Life 1.06 can only hold two-state patterns.")
+  out.write('#Life 1.06\n')
+  origin_col = model.width // 2
+  origin_row = model.height // 2
+  for r, cells in enumerate(model.model):
+    for c, state in enumerate(cells):
+      if state == 1:
+        out.write('{0} {1}\n'.format(c - origin_col, r - origin_row))
+
+# Macrocell
+
+def read_macrocell(lines, model):
+  '''Reads a macrocell quadtree into model with the tree's origin at the center of the board.
+
+  Only the nodes are kept in memory; when placing them, subtrees that fall entirely outside the board are skipped.
+
+  >>> import life, StringIO
+  >>> m = life.LifeModel(4, 4)
+  >>> read_macrocell(StringIO.StringIO('[M2] (golly 2.6)\\n#R B3/S23\\n$$$....*$.....*$...***$\\n'), m)
+  'B3/S23'
+  >>> print str(m)
+  ((0, 0, 0, 0),
+   (0, 0, 1, 0),
+   (0, 0, 0, 1),
+   (0, 1, 1, 1))
+  '''
+  rule = None
+  # Index 0 is the empty node.  Leaves are (3, bits) with bit y*8+x set for live cells.
+  nodes = [None]
+  for line in lines:
+    line = line.strip()
+    if not line:
+      continue
+    if line.startswith('#R'):
+      rule = line[2:].strip()
+      continue
+    if line.startswith('#') or line.startswith('[M2]'):
+      continue
+    if line[0] in '.*$':
+      bits = 0
+      x = y = 0
+      for ch in line:
+        if ch == '$':
+          x = 0
+          y += 1
+        else:
+          if ch == '*':
+            bits |= 1 << (y * 8 + x)
+          x += 1
+      nodes.append((3, bits))
+    else:
+      try:
+        fields = [int(f) for f in line.split()]
+      except ValueError:
+        raise PatternError("Bad macrocell line: {0!r}".format(line))
+      if len(fields) != 5 or (fields[0] > 1 and max(fields[1:]) >= len(nodes)):
+        raise PatternError("Bad macrocell line: {0!r}".format(line))
+      nodes.append(tuple(fields))
+
+  if len(nodes) == 1:
+    return rule
+  root = nodes[-1]
+  half = 1 << (root[0] - 1)
+  placer = _Placer(model, model.width // 2, model.height // 2)
+
+  def place(index, x, y, level):
+    # x, y is the top-left of this node in pattern coordinates.
+    size = 1 << level
+    if index == 0 or x + size + placer.origin_col <= 0 or y + size + placer.origin_row <= 0 \
+        or x + placer.origin_col >= placer.width or y + placer.origin_row >= placer.height:
+      return
+    node = nodes[index]
+    if level == 3 and len(node) == 2:
+      bits = node[1]
+      for i in range(64):
+        if (bits >> i) & 1:
+          placer.put(x + i % 8, y + i // 8, 1)
+    elif level == 1:
+      for i, state in enumerate(node[1:]):
+        placer.put(x + i % 2, y + i // 2, state)
+    else:
+      h = size // 2
+      nw, ne, sw, se = node[1:]
+      place(nw, x, y, level - 1)
+      place(ne, x + h, y, level - 1)
+      place(sw, x, y + h, level - 1)
+      place(se, x + h, y + h, level - 1)
+
+  place(len(nodes) - 1, -half, -half, root[0])
+  return rule
+
+def write_macrocell(model, out):
+  '''Writes model as a macrocell quadtree, emitting each distinct node once as soon as it is built.
+
+  >>> import life, StringIO
+  >>> m = life.LifeModel(4, 4, ((0, 0, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1), (0, 1, 1, 1)))
+  >>> f = StringIO.StringIO()
+  >>> write_macrocell(m, f)
+  >>> print f.getvalue().strip()
+  [M2] (midiplayground)
+  #R B3/S23
+  $$$....*$.....*$...***$
+  >>> m2 = life.LifeModel(4, 4)
+  >>> f.seek(0)
+  >>> read_macrocell(f, m2)
+  'B3/S23'
+  >>> m == m2
+  True
+  '''
+  states = model.rule.states
+  origin_col = model.width // 2
+  origin_row = model.height // 2
+  level = 3
+  while (1 << (level - 1)) < max(origin_col, origin_row, model.width - origin_col, model.height - origin_row):
+    level += 1
+
+  out.write('[M2] (midiplayground)\n#R {0}\n'.format(model.rule))
+  index = {}
+
+  def cell(x, y):
+    c = x + origin_col
+    r = y + origin_row
+    if 0 <= c < model.width and 0 <= r < model.height:
+      return model.model[r][c]
+    return 0
+
+  def emit(key, line):
+    if key not in index:
+      index[key] = len(index) + 1
+      out.write(line + '\n')
+    return index[key]
+
+  def build(x, y, level):
+    size = 1 << level
+    if x + size + origin_col <= 0 or y + size + origin_row <= 0 or x + origin_col >= model.width or y + origin_row >= model.height:
+      return 0
+    if states == 2 and level == 3:
+      rows = [''.join('*' if cell(x + i, y + j) == 1 else '.' for i in range(8)).rstrip('.') for j in range(8)]
+      if not any(rows):
+        return 0
+      return emit((3, tuple(rows)), '$'.join(rows).rstrip('$') + '$')
+    if level == 1:
+      quad = (cell(x, y), cell(x + 1, y), cell(x, y + 1), cell(x + 1, y + 1))
+      if not any(quad):
+        return 0
+      return emit((1,) + quad, '1 {0} {1} {2} {3}'.format(*quad))
+    h = size // 2
+    children = (build(x, y, level - 1), build(x + h, y, level - 1), build(x, y + h, level - 1), build(x + h, y + h, level - 1))
+    if not any(children):
+      return 0
+    return emit((level,) + children, '{0} {1} {2} {3} {4}'.format(level, *children))
+
+  half = 1 << (level - 1)
+  if build(-half, -half, level) == 0:
+    # An empty tree still needs a root node.
+    out.write('{0} 0 0 0 0\n'.format(level))
+
+READERS = {
+  RLE: read_rle,
+  LIFE106: read_life106,
+  MACROCELL: read_macrocell,
+}
+
+WRITERS = {
+  RLE: write_rle,
+  LIFE106: write_life106,
+  MACROCELL: write_macrocell,
+}
+
+def test():
+  import doctest
+  doctest.testmod()
+
+if __name__ == '__main__':
+  test()
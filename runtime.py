@@ -0,0 +1,172 @@
+# MidiPlayground - Cooperative runtime
+#
+# Latest version available at: https://github.com/j3hyde/midiplayground
+#
+# Copyright (c) 2015 Jeffrey Kyllo
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''A small cooperative event loop so several toys and devices can share one process.
+
+Tasks are generator coroutines.  What a task yields tells the runtime what to do next:
+
+  * a number: resume the task after that many seconds
+  * None: resume the task after any other ready tasks have had a turn
+  * another generator: run it as a sub-coroutine and resume with its result
+
+A sub-coroutine hands back a result by raising Return(value).  Between tasks the runtime sleeps until the next one is due, so an idle loop costs nothing.  This is the same model as asyncio but works with the Python 2 that pyportmidi is built for.
+'''
+
+import heapq, itertools, sys, time, types
+
+class Return(Exception):
+  '''Raised by a coroutine to return a value to the coroutine that yielded it.'''
+  def __init__(self, value=None):
+    super(Return, self).__init__(value)
+    self.value = value
+
+class Task(object):
+  def __init__(self, coroutine, name=None):
+    self.name = name
+    self.stack = [coroutine]
+    self.done = False
+    self.result = None
+
+  def close(self):
+    '''Stops the task, running any finally blocks in its coroutines.'''
+    while self.stack:
+      self.stack.pop().close()
+    self.done = True
+
+  def __repr__(self):
+    return '<Task {0}{1}>'.format(self.name, ' done' if self.done else '')
+
+class Runtime(object):
+  '''Runs tasks cooperatively until they have all finished or stop() is called.
+
+  >>> now = [0.0]
+  >>> def fake_sleep(seconds): now[0] += seconds
+  >>> r = Runtime(clock=lambda: now[0], sleep=fake_sleep)
+  >>> def ticker(name, period, count):
+  ...   for i in range(count):
+  ...     print('{0} {1} at {2}'.format(name, i, now[0]))
+  ...     yield period
+  >>> def double(x):
+  ...   yield 0.5
+  ...   raise Return(x * 2)
+  >>> def caller():
+  ...   value = yield double(21)
+  ...   print('got {0} at {1}'.format(value, now[0]))
+  >>> t = r.spawn(ticker('a', 1, 3))
+  >>> t = r.spawn(ticker('b', 1.5, 2))
+  >>> t = r.spawn(caller())
+  >>> r.run()
+  a 0 at 0.0
+  b 0 at 0.0
+  got 42 at 0.5
+  a 1 at 1.0
+  b 1 at 1.5
+  a 2 at 2.0
+  '''
+  def __init__(self, clock=time.time, sleep=time.sleep):
+    self.clock = clock
+    self.sleep = sleep
+    self.running = False
+    self._queue = []
+    self._order = itertools.count()
+    self.tasks = []
+
+  def spawn(self, coroutine, name=None, delay=0):
+    '''Adds a coroutine to the runtime as a new task.'''
+    task = Task(coroutine, name)
+    self.tasks.append(task)
+    self._schedule(task, delay)
+    return task
+
+  def stop(self):
+    self.running = False
+
+  def _schedule(self, task, delay, value=None, error=None):
+    heapq.heappush(self._queue, (self.clock() + delay, next(self._order), task, value, error))
+
+  def run(self):
+    '''Runs until every task has finished or stop() is called.  Tasks still pending when this returns, or when an exception escapes a task, are closed.'''
+    self.running = True
+    try:
+      while self.running and self._queue:
+        due, order, task, value, error = heapq.heappop(self._queue)
+        if task.done:
+          continue
+        delay = due - self.clock()
+        if delay > 0:
+          self.sleep(delay)
+        self._step(task, value, error)
+    finally:
+      self.running = False
+      for task in self.tasks:
+        task.close()
+      del self.tasks[:]
+      del self._queue[:]
+
+  def _step(self, task, value, error):
+    '''Advances a task until it yields something to wait on.'''
+    while True:
+      coroutine = task.stack[-1]
+      try:
+        if error is not None:
+          yielded = coroutine.throw(*error)
+        else:
+          yielded = coroutine.send(value)
+      except (Return, StopIteration) as e:
+        value = getattr(e, 'value', None)
+        error = None
+      except Exception:
+        value = None
+        error = sys.exc_info()
+      else:
+        if isinstance(yielded, types.GeneratorType):
+          task.stack.append(yielded)
+          value = error = None
+          continue
+        elif yielded is None:
+          self._schedule(task, 0)
+        elif isinstance(yielded, (int, long, float)):
+          self._schedule(task, yielded)
+        else:
+          e = TypeError("Tasks may only yield a delay, None or a generator, not {0!r}.".format(yielded))
+          self._schedule(task, 0, error=(TypeError, e, None))
+        return
+
+      # The coroutine finished, hand its outcome to the one that yielded it.
+      task.stack.pop()
+      if not task.stack:
+        task.done = True
+        self.tasks.remove(task)
+        if error is not None:
+          raise error[0], error[1], error[2]
+        task.result = value
+        return
+
+def test():
+  import doctest
+  doctest.testmod()
+
+if __name__ == '__main__':
+  test()
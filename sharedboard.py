@@ -0,0 +1,159 @@
+# MidiPlayground - Shared board state
+#
+# Latest version available at: https://github.com/j3hyde/midiplayground
+#
+# Copyright (c) 2015 Jeffrey Kyllo
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''Publishes a Life board through shared memory so other processes can watch it.
+
+The board lives in a memory-mapped file (under /dev/shm where available) laid out as a fixed header followed by one byte per cell, row by row.  The header holds a magic string, a format version, the board dimensions, a sequence counter and the generation number.  The writer makes the sequence odd while it updates the board and even again when done, so a reader that sees the same even sequence before and after looking at the cells knows it saw a consistent board.  Readers map the file themselves and never talk to the simulation, so any number of them can watch without slowing it down.
+
+  >>> name = 'doctest-{0}'.format(os.getpid())
+  >>> w = SharedBoardWriter(3, 2, name)
+  >>> w.publish(((0, 1, 0), (1, 1, 0)), 7)
+  >>> r = SharedBoardReader(name)
+  >>> r.width, r.height
+  (3, 2)
+  >>> r.snapshot()
+  (7, ((0, 1, 0), (1, 1, 0)))
+  >>> seq = r.begin()
+  >>> r.cells[:3]
+  '\\x00\\x01\\x00'
+  >>> r.valid(seq)
+  True
+  >>> w.publish(((0, 0, 0), (0, 0, 0)), 8)
+  >>> r.valid(seq)
+  False
+  >>> r.close()
+  >>> w.close()
+'''
+
+import mmap, os, struct, sys, tempfile, time
+
+MAGIC = 'MPLB'
+VERSION = 1
+# magic, version, width, height, sequence, generation
+HEADER = struct.Struct('<4sIIIQQ')
+SEQUENCE_OFFSET = 16
+
+def path_for(name):
+  '''Returns the file backing the shared board called name.'''
+  directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+  return os.path.join(directory, 'midiplayground-{0}'.format(name))
+
+class SharedBoardWriter(object):
+  '''Creates a shared board and publishes generations to it.'''
+  def __init__(self, width, height, name='life'):
+    self.width = width
+    self.height = height
+    self.path = path_for(name)
+    size = HEADER.size + width * height
+    with open(self.path, 'w+b') as f:
+      f.truncate(size)
+      self.map = mmap.mmap(f.fileno(), size)
+    self.sequence = 0
+    HEADER.pack_into(self.map, 0, MAGIC, VERSION, width, height, 0, 0)
+
+  def publish(self, rows, generation):
+    '''Writes a board, given as rows of cell states such as LifeModel.model, and its generation number.'''
+    data = bytearray()
+    for row in rows:
+      data.extend(row)
+    self.sequence += 1
+    struct.pack_into('<Q', self.map, SEQUENCE_OFFSET, self.sequence)
+    self.map[HEADER.size:HEADER.size + len(data)] = str(data)
+    struct.pack_into('<Q', self.map, SEQUENCE_OFFSET + 8, generation)
+    self.sequence += 1
+    struct.pack_into('<Q', self.map, SEQUENCE_OFFSET, self.sequence)
+
+  def close(self, unlink=True):
+    self.map.close()
+    if unlink:
+      os.remove(self.path)
+
+class SharedBoardReader(object):
+  '''Attaches to a shared board published by another process.'''
+  def __init__(self, name='life'):
+    with open(path_for(name), 'rb') as f:
+      self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, self.width, self.height, _, _ = HEADER.unpack_from(self.map, 0)
+    if magic != MAGIC or version != VERSION:
+      self.map.close()
+      raise ValueError("{0} is not a version {1} shared board.".format(name, VERSION))
+    # The cells, one byte each row by row, without copying them out of shared memory.
+    self.cells = buffer(self.map, HEADER.size, self.width * self.height)
+
+  def sequence(self):
+    return struct.unpack_from('<Q', self.map, SEQUENCE_OFFSET)[0]
+
+  def generation(self):
+    return struct.unpack_from('<Q', self.map, SEQUENCE_OFFSET + 8)[0]
+
+  def begin(self):
+    '''Waits out any update in progress and returns the sequence to pass to valid() after reading cells.'''
+    while True:
+      seq = self.sequence()
+      if not seq & 1:
+        return seq
+      time.sleep(0)
+
+  def valid(self, seq):
+    '''Returns whether the board hasn't changed since begin() returned seq.'''
+    return self.sequence() == seq
+
+  def snapshot(self):
+    '''Returns a consistent (generation, rows) copy of the board.'''
+    while True:
+      seq = self.begin()
+      generation = self.generation()
+      data = bytearray(self.cells)
+      if self.valid(seq):
+        w = self.width
+        return (generation, tuple(tuple(data[r*w:(r+1)*w]) for r in range(self.height)))
+
+  def close(self):
+    del self.cells
+    self.map.close()
+
+def watch(name='life', interval=0.1):
+  '''Prints the shared board each time it changes.'''
+  reader = SharedBoardReader(name)
+  try:
+    last = None
+    while True:
+      seq = reader.begin()
+      if seq != last:
+        generation, rows = reader.snapshot()
+        print('generation {0}:'.format(generation))
+        print('\n'.join(' '.join(str(c) for c in row) for row in rows))
+        print('')
+        last = seq
+      time.sleep(interval)
+  finally:
+    reader.close()
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1 and sys.argv[1] == '--test':
+    import doctest
+    doctest.testmod()
+  else:
+    watch(*sys.argv[1:2])
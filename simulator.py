@@ -0,0 +1,330 @@
+# MidiPlayground - Launchpad simulator
+#
+# Latest version available at: https://github.com/j3hyde/midiplayground
+#
+# Copyright (c) 2015 Jeffrey Kyllo
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files
+# (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''A Launchpad Mini in software, for trying out the toys without a device.
+
+LaunchpadSimulator stands in for the pair of pypm devices a Launchpad shows up as.  Messages written to its output travel over a simulated link with limited throughput and some latency before they reach the emulated LED buffers, and messages that don't fit in the link's buffer are dropped like on a swamped USB-MIDI port.  Pad presses are scripted or random and are read back from its input.  SimulatedDriver is a MidiDriver wired to a simulator, so Life runs on it unchanged:
+
+  >>> now = [0.0]
+  >>> def clock(): return now[0]
+  >>> def sleep(seconds): now[0] += seconds
+  >>> random.seed(1)
+  >>> lp = LaunchpadSimulator(clock=clock)
+  >>> game = life.Life(SimulatedDriver(lp), terminal=False)
+  >>> lp.press(2, 3, delay=0.5)
+  >>> lp.press(8, 0, delay=1.0)
+  >>> r = runtime.Runtime(clock, sleep)
+  >>> game.start(r, 0.1)
+  >>> def stop():
+  ...   yield 2.0
+  ...   r.stop()
+  >>> t = r.spawn(stop())
+  >>> r.run()
+  running
+  input: 2, 3, 127
+  >>> game.model['paused']
+  True
+  >>> lp.rows() == tuple(tuple(row) for row in game.model.model)
+  True
+  >>> lp.led(8, 0)
+  51
+  >>> lp.dropped
+  0
+'''
+
+import collections, heapq, itertools, random, time
+import life, runtime
+
+class SimulatedPort(object):
+  '''One side of a simulated device, with the methods of a pypm.Input or pypm.Output.'''
+  def __init__(self, **methods):
+    self.__dict__.update(methods)
+
+  def Close(self):
+    pass
+
+class LaunchpadSimulator(object):
+  '''Emulates a Launchpad Mini's LEDs and buttons behind a MIDI link of limited bandwidth.
+
+  LEDs are keyed by (col, row) like the UI: column 8 is the round buttons down the side and row -1 the round buttons along the top.  Their values are what the Launchpad shows: red brightness in the low two bits and green brightness in bits four and five.
+
+  >>> now = [0.0]
+  >>> lp = LaunchpadSimulator(clock=lambda: now[0])
+  >>> lp.output.Write([[[144, 0, 127, 0], 0], [[144, 8, 60, 0], 0], [[176, 104, 3, 0], 0]])
+  >>> lp.led(0, 0)
+  0
+  >>> now[0] += 0.01
+  >>> lp.led(0, 0), lp.led(8, 0), lp.led(0, -1)
+  (51, 48, 3)
+  >>> lp.messages, lp.bytes, lp.delivered
+  (3, 9, 3)
+
+  With double buffering, LEDs can be drawn into the hidden buffer and then shown all at once:
+
+  >>> lp.output.Write([[[176, 0, 0x21, 0], 0], [[144, 1, 0x03, 0], 0]])
+  >>> now[0] += 0.01
+  >>> lp.led(1, 0)
+  0
+  >>> lp.output.Write([[[176, 0, 0x24, 0], 0]])
+  >>> now[0] += 0.01
+  >>> lp.led(1, 0)
+  3
+
+  Rapid update messages set two LEDs each, working through the grid, then the side and then the top row:
+
+  >>> lp.output.Write([[[176, 0, 0, 0], 0], [[146, 16, 17, 0], 0], [[146, 18, 19, 0], 0]])
+  >>> now[0] += 0.01
+  >>> [lp.led(c, 0) for c in range(5)]
+  [16, 17, 18, 19, 0]
+
+  Messages written faster than the link carries them wait in its buffer, and are dropped once it's full:
+
+  >>> lp = LaunchpadSimulator(clock=lambda: now[0], buffer_bytes=6)
+  >>> lp.output.Write([[[144, n, 127, 0], 0] for n in range(5)])
+  >>> lp.messages, lp.dropped
+  (2, 3)
+  >>> now[0] += 0.01
+  >>> [lp.led(c, 0) for c in range(5)]
+  [51, 51, 0, 0, 0]
+
+  Presses are read back from the input once they're due:
+
+  >>> lp.press(3, 4, delay=0.5)
+  >>> lp.release(3, 4, delay=0.6)
+  >>> lp.input.Poll()
+  False
+  >>> now[0] += 1
+  >>> lp.input.Read(10)
+  [[[144, 67, 127, 0], 550], [[144, 67, 0, 0], 650]]
+  '''
+  MESSAGE_BYTES = 3
+  # The LEDs set by successive rapid update messages.
+  RAPID_ORDER = [(c, r) for r in range(8) for c in range(8)] + [(8, r) for r in range(8)] + [(c, -1) for c in range(8)]
+  TOP_ROW_CONTROLLERS = range(104, 112)
+  # Seconds each buffer is shown for while flashing.
+  flash_interval = 0.25
+
+  def __init__(self, bandwidth=3125, latency=0.001, buffer_bytes=1024, clock=time.time):
+    '''Simulates a device on a link carrying bandwidth bytes per second and delivering each message latency seconds after it has been sent.  Messages written while more than buffer_bytes are waiting to be sent are dropped.'''
+    if bandwidth <= 0:
+      raise ValueError("The bandwidth must be greater than 0, not {0}.".format(bandwidth))
+    self.bandwidth = bandwidth
+    self.latency = latency
+    self.buffer_bytes = buffer_bytes
+    self.clock = clock
+    self.input = SimulatedPort(Poll=self.poll, Read=self.read)
+    self.output = SimulatedPort(Write=self.write)
+
+    # Messages on their way to the device as (arrival time, time sent, message), and when the link is next free.
+    self.link = collections.deque()
+    self.link_free = 0
+    # Presses on their way to the host as (time, order, message).
+    self.pending_input = []
+    self._order = itertools.count()
+
+    self.bytes = 0
+    self.messages = 0
+    self.dropped = 0
+    self.delivered = 0
+    self.presses = 0
+    self.ignored = 0
+    self.latency_total = 0
+    self.latency_max = 0
+    self.reset()
+
+  def reset(self):
+    '''Turns every LED off and goes back to a single buffer, as the Launchpad does on B0 00 00.'''
+    self.buffers = ({}, {})
+    self.display = 0
+    self.update = 0
+    self.flashing = False
+    self.rapid = 0
+
+  # The host side of the link.
+
+  def write(self, events):
+    '''Sends messages in the [[status, data1, data2, 0], timestamp] form taken by pypm.Output.Write.'''
+    now = self.clock()
+    for message, timestamp in events:
+      backlog = round(max(0, self.link_free - now) * self.bandwidth, 6)
+      if backlog + self.MESSAGE_BYTES > self.buffer_bytes:
+        self.dropped += 1
+        continue
+      self.link_free = max(self.link_free, now) + float(self.MESSAGE_BYTES) / self.bandwidth
+      self.link.append((self.link_free + self.latency, now, message))
+      self.messages += 1
+      self.bytes += self.MESSAGE_BYTES
+
+  def poll(self):
+    return bool(self.pending_input) and self.pending_input[0][0] <= self.clock()
+
+  def read(self, count):
+    '''Returns up to count due presses in the [[status, data1, data2, 0], timestamp] form returned by pypm.Input.Read.'''
+    now = self.clock()
+    events = []
+    while self.pending_input and self.pending_input[0][0] <= now and len(events) < count:
+      at, order, message = heapq.heappop(self.pending_input)
+      events.append([message, int(round(at * 1000))])
+    return events
+
+  # Buttons.
+
+  def press(self, col, row, velocity=127, delay=0):
+    '''Presses a button delay seconds from now.'''
+    if row == -1:
+      message = [0xB0, self.TOP_ROW_CONTROLLERS[col], velocity, 0]
+    else:
+      message = [0x90, row * 16 + col, velocity, 0]
+    heapq.heappush(self.pending_input, (self.clock() + delay, next(self._order), message))
+    if velocity:
+      self.presses += 1
+
+  def release(self, col, row, delay=0):
+    self.press(col, row, 0, delay)
+
+  def script(self, events):
+    '''Schedules presses given as (delay, col, row) tuples, each released hold seconds later if an optional fourth item holds it.'''
+    for event in events:
+      delay, col, row = event[:3]
+      self.press(col, row, delay=delay)
+      if len(event) > 3:
+        self.release(col, row, delay + event[3])
+
+  def random_presses(self, count, duration, hold=0.1, rand=random, pads=None):
+    '''Schedules count presses of random pads, by default anywhere on the grid, over the next duration seconds.'''
+    if pads is None:
+      pads = [(c, r) for r in range(8) for c in range(8)]
+    self.script((rand.uniform(0, duration),) + rand.choice(pads) + (hold,) for i in range(count))
+
+  # The device side of the link.
+
+  def deliver(self):
+    '''Applies the messages that have arrived by now.'''
+    now = self.clock()
+    link = self.link
+    while link and link[0][0] <= now:
+      arrival, sent, message = link.popleft()
+      self.receive(message)
+      self.delivered += 1
+      self.latency_total += arrival - sent
+      self.latency_max = max(self.latency_max, arrival - sent)
+
+  def receive(self, message):
+    '''Acts on one message as the Launchpad would.'''
+    status, data1, data2 = message[:3]
+    if status == 0x92:
+      # Rapid update; any other message starts the next one from the top.
+      for velocity in (data1, data2):
+        self.set_led(self.RAPID_ORDER[self.rapid], velocity)
+        self.rapid = (self.rapid + 1) % len(self.RAPID_ORDER)
+      return
+    self.rapid = 0
+
+    if status in (0x90, 0x80) and data1 % 16 <= 8 and data1 < 128:
+      self.set_led((data1 % 16, data1 // 16), data2 if status == 0x90 else 0)
+    elif status == 0xB0 and data1 in self.TOP_ROW_CONTROLLERS:
+      self.set_led((data1 - self.TOP_ROW_CONTROLLERS[0], -1), data2)
+    elif status == 0xB0 and data1 == 0 and data2 == 0:
+      self.reset()
+    elif status == 0xB0 and data1 == 0 and data2 & 0x60 == 0x20:
+      self.display = data2 & 1
+      self.update = (data2 >> 2) & 1
+      self.flashing = bool(data2 & 8)
+      if data2 & 16:
+        self.buffers[self.update].clear()
+        self.buffers[self.update].update(self.buffers[self.display])
+    elif status == 0xB0 and data1 == 0 and data2 in (0x7D, 0x7E, 0x7F):
+      # Test mode, every LED on at low, medium or full brightness.
+      level = data2 - 0x7C
+      for key in self.RAPID_ORDER:
+        for buf in self.buffers:
+          buf[key] = level | level << 4
+    else:
+      self.ignored += 1
+
+  def set_led(self, key, velocity):
+    '''Sets an LED from a note velocity: the color bits plus the copy flag (4), which writes both buffers, and the clear flag (8), which turns the LED off in the other one.'''
+    color = velocity & 0x33
+    if velocity & 4:
+      self.buffers[0][key] = self.buffers[1][key] = color
+    else:
+      self.buffers[self.update][key] = color
+      if velocity & 8:
+        self.buffers[1 - self.update][key] = 0
+
+  def shown(self):
+    '''Returns the index of the buffer being displayed.'''
+    if self.flashing:
+      return int(self.clock() / self.flash_interval) % 2
+    return self.display
+
+  def leds(self):
+    '''Returns the lit LEDs, as a dict from (col, row) to value.'''
+    self.deliver()
+    return dict((k, v) for k, v in self.buffers[self.shown()].items() if v)
+
+  def led(self, col, row):
+    self.deliver()
+    return self.buffers[self.shown()].get((col, row), 0)
+
+  def rows(self):
+    '''Returns the main grid's LEDs as rows of values.'''
+    self.deliver()
+    buf = self.buffers[self.shown()]
+    return tuple(tuple(buf.get((c, r), 0) for c in range(8)) for r in range(8))
+
+  def counters(self):
+    '''Returns the link and button counters, in the order they're printed.'''
+    self.deliver()
+    return collections.OrderedDict((
+      ('messages', self.messages),
+      ('bytes', self.bytes),
+      ('dropped', self.dropped),
+      ('delivered', self.delivered),
+      ('mean latency ms', 1000.0 * self.latency_total / self.delivered if self.delivered else 0),
+      ('max latency ms', 1000.0 * self.latency_max),
+      ('presses', self.presses),
+      ('ignored', self.ignored)))
+
+class SimulatedDriver(life.MidiDriver):
+  '''A MidiDriver talking to a LaunchpadSimulator rather than a real device.  It paces its output to the simulated link's bandwidth unless given another.'''
+  def __init__(self, launchpad, **kwargs):
+    self.launchpad = launchpad
+    kwargs.setdefault('bandwidth', launchpad.bandwidth)
+    kwargs.setdefault('clock', launchpad.clock)
+    super(SimulatedDriver, self).__init__(None, None, **kwargs)
+
+  def open_devices(self, in_device_id, out_device_id):
+    return (self.launchpad.input, self.launchpad.output)
+
+  def time(self):
+    return int(round(self.launchpad.clock() * 1000))
+
+def test():
+  import doctest
+  doctest.testmod()
+
+if __name__ == '__main__':
+  test()